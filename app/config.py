@@ -4,7 +4,7 @@
 """
 from pydantic_settings import BaseSettings
 from urllib.parse import quote_plus
-from typing import Optional
+from typing import List, Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -20,6 +20,33 @@ class Settings(BaseSettings):
     # 连接池配置
     DB_POOL_MIN_SIZE: int = 1
     DB_POOL_MAX_SIZE: int = 10
+    DB_READ_POOL_MIN_SIZE: int = 1
+    DB_READ_POOL_MAX_SIZE: int = 20
+    DB_READ_POOL_TIMEOUT: float = 5.0
+    # 流式导出独占的小连接池，慢客户端不会占用查询池
+    DB_STREAM_POOL_MIN_SIZE: int = 0
+    DB_STREAM_POOL_MAX_SIZE: int = 4
+    DB_STREAM_POOL_TIMEOUT: float = 5.0
+
+    # 空闲事务超时 idle_in_transaction_session_timeout（PostgreSQL 9.6+）
+    # 默认为空即不设置；确认目标数据库支持该参数后按部署开启，例如写入/查询池 "5s"、流式池 "300s"。
+    # 流式池需放宽：流式接口在等待客户端读取时连接处于事务中，
+    # 客户端停止读取超过该时长，服务端会终止会话，响应体被截断
+    DB_IDLE_IN_TRANSACTION_TIMEOUT: str = ""
+    DB_READ_IDLE_IN_TRANSACTION_TIMEOUT: str = ""
+    DB_STREAM_IDLE_IN_TRANSACTION_TIMEOUT: str = ""
+
+    # 预编译语句配置（0 表示首次执行即 prepare）
+    DB_PREPARE_THRESHOLD: int = 0
+    DB_PREPARED_MAX: int = 200
+    DB_PLAN_CACHE_MODE: Literal["auto", "force_custom_plan", "force_generic_plan"] = "force_custom_plan"
+
+    # 每日统计物化视图（PostgreSQL 语法，openGauss 等不支持时保持关闭，直接聚合明细表）
+    DAILY_STATS_USE_MATVIEW: bool = False
+    # 服务端不支持 REFRESH ... CONCURRENTLY 时关闭，改用普通 REFRESH（刷新期间阻塞读）
+    DAILY_STATS_REFRESH_CONCURRENTLY: bool = True
+    # 刷新间隔（秒）
+    DAILY_STATS_REFRESH_INTERVAL: int = 3600
     
     # Playwright Service 配置
     PLAYWRIGHT_SERVICE_URL: str = "http://playwright-service:8000"
@@ -29,6 +56,9 @@ class Settings(BaseSettings):
     
     # 日志配置
     LOG_LEVEL: str = "INFO"
+
+    # CORS 配置（环境变量为 JSON 数组，如 ["https://a.example.com"]）
+    CORS_ALLOW_ORIGINS: List[str] = ["*"]
     
     class Config:
         env_file = ".env"
@@ -2,9 +2,15 @@
 数据库连接池管理
 使用 psycopg (v3) 直接操作 openGauss / PostgreSQL
 """
+import asyncio
+import functools
 import logging
-from typing import Optional
+import sys
+from contextlib import AsyncExitStack
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
 from datetime import datetime
+import orjson
+import psycopg
 from psycopg.rows import dict_row
 from psycopg_pool import AsyncConnectionPool
 
@@ -12,28 +18,174 @@ from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# 服务端游标每次从数据库拉取的行数
+STREAM_ITERSIZE = 1000
+
+
+# SQL 语句统一定义为模块级常量：
+# psycopg 的预编译语句缓存以 SQL 文本为 key，文本固定才能稳定命中
+INSERT_SNAPSHOT_SQL = """
+INSERT INTO external_link_snapshot
+(origin_url, click_type, click_value, page_url, page_hash, screenshot_path)
+VALUES (%s, %s, %s, %s, %s, %s)
+RETURNING id;
+"""
+
+# 会话参数通过绑定参数设置，不把配置值拼进 SQL 文本
+SET_SESSION_CONFIG_SQL = """
+SELECT set_config(%s, %s, false);
+"""
+
+SET_LOCAL_GENERIC_PLAN_SQL = """
+SET LOCAL plan_cache_mode = force_generic_plan;
+"""
+
+DAILY_STATS_LAST_60_DAYS_SQL = """
+SELECT
+    date_trunc('day', created_at) AS day,
+    origin_url,
+    COUNT(id) AS total_events,
+    COUNT(DISTINCT page_hash) AS unique_pages
+FROM external_link_snapshot
+WHERE created_at >= NOW() - INTERVAL '60 days'
+GROUP BY day, origin_url
+ORDER BY day ASC, origin_url ASC;
+"""
+
+# 以下物化视图相关语句为 PostgreSQL 语法，仅在 DAILY_STATS_USE_MATVIEW 开启时使用
+DAILY_STATS_LAST_60_DAYS_MATVIEW_SQL = """
+SELECT day, origin_url, total_events, unique_pages
+FROM mv_daily_origin_stats
+WHERE day >= date_trunc('day', NOW() - INTERVAL '60 days')
+ORDER BY day ASC, origin_url ASC;
+"""
+
+REFRESH_DAILY_STATS_SQL = """
+REFRESH MATERIALIZED VIEW mv_daily_origin_stats;
+"""
+
+REFRESH_DAILY_STATS_CONCURRENTLY_SQL = """
+REFRESH MATERIALIZED VIEW CONCURRENTLY mv_daily_origin_stats;
+"""
+
+# 物化视图刷新的 advisory lock：多个 worker / 实例中只有持有该锁的一个负责刷新
+DAILY_STATS_REFRESH_LOCK_ID = 0x656C6D01
+
+TRY_ADVISORY_LOCK_SQL = """
+SELECT pg_try_advisory_lock(%s);
+"""
+
+YESTERDAY_EVENTS_SQL = """
+SELECT *
+FROM external_link_snapshot
+WHERE created_at >= date_trunc('day', NOW() - INTERVAL '1 day')
+AND created_at < date_trunc('day', NOW())
+ORDER BY created_at ASC;
+"""
+
+EVENTS_BY_DAY_SQL = """
+SELECT *
+FROM external_link_snapshot
+WHERE created_at >= %s::date
+AND created_at < (%s::date + INTERVAL '1 day')
+ORDER BY origin_url ASC, created_at ASC;
+"""
+
+EVENTS_BY_MONTH_SQL = """
+SELECT *
+FROM external_link_snapshot
+WHERE created_at >= %s
+AND created_at <  %s
+ORDER BY origin_url ASC, created_at ASC;
+"""
+
+EVENTS_BY_RANGE_SQL = """
+SELECT *
+FROM external_link_snapshot
+WHERE created_at >= %s
+AND created_at <= %s
+ORDER BY origin_url ASC, created_at ASC;
+"""
+
+# 分页查询：按 (created_at, id) 做 keyset 分页，每页工作量有上限
+EVENTS_BY_MONTH_PAGE_SQL = """
+SELECT *
+FROM external_link_snapshot
+WHERE created_at >= %s
+AND created_at <  %s
+ORDER BY created_at ASC, id ASC
+LIMIT %s;
+"""
+
+EVENTS_BY_MONTH_PAGE_AFTER_SQL = """
+SELECT *
+FROM external_link_snapshot
+WHERE created_at >= %s
+AND created_at <  %s
+AND (created_at, id) > (%s, %s)
+ORDER BY created_at ASC, id ASC
+LIMIT %s;
+"""
+
+EVENTS_BY_RANGE_PAGE_SQL = """
+SELECT *
+FROM external_link_snapshot
+WHERE created_at >= %s
+AND created_at <= %s
+ORDER BY created_at ASC, id ASC
+LIMIT %s;
+"""
+
+EVENTS_BY_RANGE_PAGE_AFTER_SQL = """
+SELECT *
+FROM external_link_snapshot
+WHERE created_at >= %s
+AND created_at <= %s
+AND (created_at, id) > (%s, %s)
+ORDER BY created_at ASC, id ASC
+LIMIT %s;
+"""
+
 
 class Database:
     """数据库连接池管理器（psycopg async）"""
 
     def __init__(self):
+        # pool: 写入用的短事务连接池；read_pool: 查询用的连接池；
+        # stream_pool: 流式导出用的连接池（连接占用时间取决于客户端读取速度）
+        # 分开后，任何一类请求都不会占满其他请求所需的连接
         self.pool: Optional[AsyncConnectionPool] = None
+        self.read_pool: Optional[AsyncConnectionPool] = None
+        self.stream_pool: Optional[AsyncConnectionPool] = None
+        self._stats_refresh_task: Optional[asyncio.Task] = None
+        # 持有刷新 advisory lock 的专用连接（本进程为刷新者时非空）
+        self._stats_refresh_conn: Optional[psycopg.AsyncConnection] = None
 
     async def connect(self):
         """创建连接池"""
         logger.info(
-            f"正在连接数据库: "
-            f"{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+            "正在连接数据库: %s:%s/%s",
+            settings.DB_HOST, settings.DB_PORT, settings.DB_NAME
         )
 
         try:
-            # psycopg 使用连接字符串（dsn）
-            self.pool = AsyncConnectionPool(
-                conninfo=settings.database_dsn,
+            self.pool = self._create_pool(
                 min_size=settings.DB_POOL_MIN_SIZE,
                 max_size=settings.DB_POOL_MAX_SIZE,
                 timeout=60,
-                open=True,
+                idle_in_transaction_timeout=settings.DB_IDLE_IN_TRANSACTION_TIMEOUT,
+            )
+            self.read_pool = self._create_pool(
+                min_size=settings.DB_READ_POOL_MIN_SIZE,
+                max_size=settings.DB_READ_POOL_MAX_SIZE,
+                timeout=settings.DB_READ_POOL_TIMEOUT,
+                idle_in_transaction_timeout=settings.DB_READ_IDLE_IN_TRANSACTION_TIMEOUT,
+            )
+            self.stream_pool = self._create_pool(
+                min_size=settings.DB_STREAM_POOL_MIN_SIZE,
+                max_size=settings.DB_STREAM_POOL_MAX_SIZE,
+                timeout=settings.DB_STREAM_POOL_TIMEOUT,
+                idle_in_transaction_timeout=settings.DB_STREAM_IDLE_IN_TRANSACTION_TIMEOUT,
             )
 
             logger.info("数据库连接池创建成功")
@@ -42,12 +194,95 @@ class Database:
             # 如果你现在还想保留，也可以用
             await self._init_tables()
 
+            if settings.DAILY_STATS_USE_MATVIEW:
+                self._stats_refresh_task = asyncio.create_task(
+                    self._refresh_daily_stats_loop()
+                )
+
         except Exception as e:
-            logger.error(f"数据库连接失败: {e}")
+            logger.error("数据库连接失败: %s", e)
             raise
 
+    def _create_pool(
+        self,
+        min_size: int,
+        max_size: int,
+        timeout: float,
+        idle_in_transaction_timeout: str
+    ) -> AsyncConnectionPool:
+        """创建并打开一个连接池"""
+        # psycopg 使用连接字符串（dsn）
+        return AsyncConnectionPool(
+            conninfo=settings.database_dsn,
+            min_size=min_size,
+            max_size=max_size,
+            timeout=timeout,
+            # 每个连接从第一次执行起就使用服务端预编译语句，
+            # 省去短连接会话里反复的 Parse/Plan 开销
+            # （prepared_max 不是连接参数，在 _configure_connection 中设置）
+            kwargs={
+                "prepare_threshold": settings.DB_PREPARE_THRESHOLD,
+            },
+            configure=functools.partial(
+                self._configure_connection,
+                idle_in_transaction_timeout=idle_in_transaction_timeout
+            ),
+            open=True,
+        )
+
+    async def _configure_connection(self, conn, idle_in_transaction_timeout: str):
+        """
+        新建连接时设置会话参数
+        
+        预编译语句执行 5 次后，PostgreSQL 可能改用不看参数值的通用计划（generic plan）。
+        按时间区间查询的选择性随参数变化很大，通用计划可能放弃索引扫描，
+        出现"前 5 次很快、之后突然变慢"的情况，因此会话默认强制使用定制计划
+        （plan_cache_mode 自 PostgreSQL 12 起提供）。
+        
+        idle_in_transaction_session_timeout 让服务端回收忘记提交的事务，
+        防止连接长期被占用；为空时不设置。
+        """
+        conn.prepared_max = settings.DB_PREPARED_MAX
+        await conn.execute(
+            SET_SESSION_CONFIG_SQL,
+            ("plan_cache_mode", settings.DB_PLAN_CACHE_MODE),
+            prepare=False
+        )
+        if idle_in_transaction_timeout:
+            await conn.execute(
+                SET_SESSION_CONFIG_SQL,
+                ("idle_in_transaction_session_timeout", idle_in_transaction_timeout),
+                prepare=False
+            )
+        # configure 回调结束时连接必须处于空闲状态
+        await conn.commit()
+
+    def get_pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """返回写入 / 查询 / 流式连接池的运行指标"""
+        return {
+            "pool": self.pool.get_stats() if self.pool else {},
+            "read_pool": self.read_pool.get_stats() if self.read_pool else {},
+            "stream_pool": self.stream_pool.get_stats() if self.stream_pool else {},
+        }
+
     async def disconnect(self):
         """关闭连接池"""
+        if self._stats_refresh_task:
+            self._stats_refresh_task.cancel()
+            try:
+                await self._stats_refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._stats_refresh_task = None
+
+        await self._release_stats_refresh_lock()
+
+        if self.stream_pool:
+            await self.stream_pool.close()
+
+        if self.read_pool:
+            await self.read_pool.close()
+
         if self.pool:
             await self.pool.close()
             logger.info("数据库连接池已关闭")
@@ -69,18 +304,102 @@ class Database:
         );
         """
 
+        # 按时间区间查询是主要负载，(created_at, origin_url) 支持索引范围扫描；
+        # id 上的单独索引与主键重复，予以删除
         create_indexes = """
         CREATE INDEX IF NOT EXISTS idx_external_link_snapshot_origin ON external_link_snapshot(origin_url);
-        CREATE INDEX IF NOT EXISTS idx_external_link_snapshot_id ON external_link_snapshot(id);
+        CREATE INDEX IF NOT EXISTS idx_external_link_snapshot_created_origin ON external_link_snapshot(created_at, origin_url);
+        DROP INDEX IF EXISTS idx_external_link_snapshot_id;
+        """
+
+        # 按天 + origin_url 预聚合，避免每次请求都对 60 天明细做 GROUP BY；
+        # 只聚合最近 61 天（查询读取 60 天，多留一天覆盖刷新间隔），刷新成本不随历史增长；
+        # 唯一索引是 REFRESH ... CONCURRENTLY 的前提。
+        # 语法为 PostgreSQL 专有，openGauss 等不支持时保持 DAILY_STATS_USE_MATVIEW 关闭
+        create_daily_stats_view = """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS mv_daily_origin_stats AS
+        SELECT
+            date_trunc('day', created_at) AS day,
+            origin_url,
+            COUNT(id) AS total_events,
+            COUNT(DISTINCT page_hash) AS unique_pages
+        FROM external_link_snapshot
+        WHERE created_at >= date_trunc('day', NOW() - INTERVAL '61 days')
+        GROUP BY 1, 2;
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_daily_origin_stats_day_origin ON mv_daily_origin_stats(day, origin_url);
         """
 
         async with self.pool.connection() as conn:
             async with conn.cursor() as cur:
-                await cur.execute(create_table)
-                await cur.execute(create_indexes)
+                # DDL 只执行一次且包含多条语句，不能作为预编译语句发送
+                await cur.execute(create_table, prepare=False)
+                await cur.execute(create_indexes, prepare=False)
+                if settings.DAILY_STATS_USE_MATVIEW:
+                    await cur.execute(create_daily_stats_view, prepare=False)
 
         logger.info("数据库表初始化完成")
 
+    async def _acquire_stats_refresh_lock(self) -> bool:
+        """
+        尝试成为物化视图的刷新者
+        
+        在专用的 autocommit 连接上获取会话级 advisory lock，锁随连接保持；
+        进程退出或连接断开时锁自动释放，其他 worker 下一轮即可接手。
+        """
+        if self._stats_refresh_conn is not None:
+            return True
+
+        conn = await psycopg.AsyncConnection.connect(
+            settings.database_dsn,
+            autocommit=True
+        )
+        try:
+            cur = await conn.execute(TRY_ADVISORY_LOCK_SQL, (DAILY_STATS_REFRESH_LOCK_ID,))
+            row = await cur.fetchone()
+        except BaseException:
+            await conn.close()
+            raise
+
+        if not row[0]:
+            await conn.close()
+            return False
+
+        self._stats_refresh_conn = conn
+        logger.info("本进程负责刷新每日统计物化视图")
+        return True
+
+    async def _release_stats_refresh_lock(self):
+        """关闭刷新专用连接，释放 advisory lock"""
+        if self._stats_refresh_conn is not None:
+            await self._stats_refresh_conn.close()
+            self._stats_refresh_conn = None
+
+    async def _refresh_daily_stats_loop(self):
+        """
+        按固定间隔刷新每日统计物化视图
+        
+        每个 worker 都运行该循环，但只有持有 advisory lock 的那一个执行刷新，
+        其余 worker 每轮重新尝试获取锁。
+        """
+        interval = settings.DAILY_STATS_REFRESH_INTERVAL
+        if settings.DAILY_STATS_REFRESH_CONCURRENTLY:
+            refresh_sql = REFRESH_DAILY_STATS_CONCURRENTLY_SQL
+        else:
+            refresh_sql = REFRESH_DAILY_STATS_SQL
+        while True:
+            try:
+                if await self._acquire_stats_refresh_lock():
+                    await self._stats_refresh_conn.execute(refresh_sql)
+                    logger.info("每日统计物化视图已刷新")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("刷新每日统计物化视图失败: %s", e, exc_info=True)
+                # 连接可能已失效，放弃锁，下一轮重新竞争
+                await self._release_stats_refresh_lock()
+
+            await asyncio.sleep(interval)
+
     async def insert_snapshot(
         self,
         origin_url: str,
@@ -107,39 +426,68 @@ class Database:
         
         async with self.pool.connection() as conn:
             async with conn.cursor(row_factory=dict_row) as cur:
-                insert_sql = """
-                INSERT INTO external_link_snapshot 
+                # BEGIN / INSERT / COMMIT 在 pipeline 中一次发出，
+                # 只需一次网络往返；结果在 pipeline 同步后可读
+                async with conn.pipeline(), conn.transaction():
+                    await cur.execute(
+                        INSERT_SNAPSHOT_SQL,
+                        (
+                        origin_url, click_type, click_value, page_url, page_hash, screenshot_path
+                        ),
+                    )
+                row = await cur.fetchone()
+                return row["id"]
+
+    async def insert_snapshots_many(
+        self,
+        rows: Sequence[Tuple[str, str, str, Optional[str], Optional[str], str]]
+    ) -> List[int]:
+        """
+        批量插入快照记录
+        
+        使用 pipeline 模式的 executemany，N 条 INSERT 共用一次网络往返，
+        并复用同一条预编译语句
+        
+        Args:
+            rows: 每个元素为
                 (origin_url, click_type, click_value, page_url, page_hash, screenshot_path)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                RETURNING id;
-                """
-
-                await cur.execute(
-                    insert_sql,
-                    (
-                    origin_url, click_type, click_value, page_url, page_hash, screenshot_path
-                    ),
-                )
-                return await cur.fetchone()
+            
+        Returns:
+            按输入顺序排列的插入记录 ID 列表
+        """
+        if not rows:
+            return []
+
+        ids: List[int] = []
+        async with self.pool.connection() as conn:
+            async with conn.pipeline(), conn.transaction():
+                # INSERT ... VALUES 的计划与参数无关，批量插入时在本事务内
+                # 改用通用计划，省去每行重新生成定制计划的开销
+                await conn.execute(SET_LOCAL_GENERIC_PLAN_SQL, prepare=False)
+                async with conn.cursor(row_factory=dict_row) as cur:
+                    await cur.executemany(INSERT_SNAPSHOT_SQL, rows, returning=True)
+                    while True:
+                        row = await cur.fetchone()
+                        ids.append(row["id"])
+                        if not cur.nextset():
+                            break
+
+        return ids
 
     async def get_daily_stats_last_60_days(self):
         """
         返回最近 60 天内，
         每天 + 每个 origin_url 的事件总数和 page_hash 去重数
+        
+        开启 DAILY_STATS_USE_MATVIEW 时数据来自物化视图 mv_daily_origin_stats，
+        最多滞后 DAILY_STATS_REFRESH_INTERVAL 秒；否则直接对明细表聚合
         """
-        sql = """
-        SELECT
-            date_trunc('day', created_at) AS day,
-            origin_url,
-            COUNT(id) AS total_events,
-            COUNT(DISTINCT page_hash) AS unique_pages
-        FROM external_link_snapshot
-        WHERE created_at >= NOW() - INTERVAL '60 days'
-        GROUP BY day, origin_url
-        ORDER BY day ASC, origin_url ASC;
-        """
+        if settings.DAILY_STATS_USE_MATVIEW:
+            sql = DAILY_STATS_LAST_60_DAYS_MATVIEW_SQL
+        else:
+            sql = DAILY_STATS_LAST_60_DAYS_SQL
 
-        async with self.pool.connection() as conn:
+        async with self.read_pool.connection() as conn:
             async with conn.cursor(row_factory=dict_row) as cur:
                 await cur.execute(sql)
                 return await cur.fetchall()
@@ -148,17 +496,9 @@ class Database:
         """
         返回昨天所有 origin 的事件明细
         """
-        sql = """
-        SELECT *
-        FROM external_link_snapshot
-        WHERE created_at >= date_trunc('day', NOW() - INTERVAL '1 day')
-        AND created_at < date_trunc('day', NOW())
-        ORDER BY created_at ASC;
-        """
-
-        async with self.pool.connection() as conn:
+        async with self.read_pool.connection() as conn:
             async with conn.cursor(row_factory=dict_row) as cur:
-                await cur.execute(sql)
+                await cur.execute(YESTERDAY_EVENTS_SQL)
                 return await cur.fetchall()
 
     async def get_events_by_day(self, day: str):
@@ -166,72 +506,186 @@ class Database:
         返回指定日期（YYYY-MM-DD）当天，
         所有 origin 的事件明细
         """
-        sql = """
-        SELECT *
-        FROM external_link_snapshot
-        WHERE created_at >= %s::date
-        AND created_at < (%s::date + INTERVAL '1 day')
-        ORDER BY origin_url ASC, created_at ASC;
-        """
-
-        async with self.pool.connection() as conn:
+        async with self.read_pool.connection() as conn:
             async with conn.cursor(row_factory=dict_row) as cur:
-                await cur.execute(sql, (day, day))
+                await cur.execute(EVENTS_BY_DAY_SQL, (day, day))
                 return await cur.fetchall()
 
 
-    async def get_events_by_month(self, year: int, month: int):
+    async def get_events_by_month(
+        self,
+        year: int,
+        month: int,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None
+    ) -> Dict[str, Any]:
         """
-        返回某年某月，
+        分页返回某年某月，
         所有 origin 的事件明细
+        
+        Args:
+            year: 年份
+            month: 月份
+            limit: 每页最大条数
+            after: 上一页返回的 next 游标 (created_at, id)，为空时取第一页
+            
+        Returns:
+            {"rows": 本页记录, "next": 下一页游标，没有更多数据时为 None}
         """
-        start_time = datetime(year, month, 1)
-        if month == 12:
-            end_time = datetime(year + 1, 1, 1)
-        else:
-            end_time = datetime(year, month + 1, 1)
+        start_time, end_time = self._month_bounds(year, month)
+
+        return await self._fetch_page(
+            EVENTS_BY_MONTH_PAGE_SQL,
+            EVENTS_BY_MONTH_PAGE_AFTER_SQL,
+            start_time,
+            end_time,
+            limit,
+            after
+        )
 
-        sql = """
-        SELECT *
-        FROM external_link_snapshot
-        WHERE created_at >= %s
-        AND created_at <  %s
-        ORDER BY origin_url ASC, created_at ASC;
+
+    async def get_events_by_range(
+        self,
+        start_time: str,
+        end_time: str,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None
+    ) -> Dict[str, Any]:
         """
+        分页返回指定时间区间内，
+        所有 origin 的事件明细
+        
+        Args:
+            start_time: 开始时间
+            end_time: 结束时间
+            limit: 每页最大条数
+            after: 上一页返回的 next 游标 (created_at, id)，为空时取第一页
+            
+        Returns:
+            {"rows": 本页记录, "next": 下一页游标，没有更多数据时为 None}
+        """
+        return await self._fetch_page(
+            EVENTS_BY_RANGE_PAGE_SQL,
+            EVENTS_BY_RANGE_PAGE_AFTER_SQL,
+            start_time,
+            end_time,
+            limit,
+            after
+        )
 
-        async with self.pool.connection() as conn:
+    async def _fetch_page(
+        self,
+        first_page_sql: str,
+        after_sql: str,
+        start_time,
+        end_time,
+        limit: int,
+        after: Optional[Tuple[datetime, int]]
+    ) -> Dict[str, Any]:
+        """按 (created_at, id) keyset 分页读取一页记录"""
+        if after is None:
+            sql = first_page_sql
+            params = (start_time, end_time, limit)
+        else:
+            sql = after_sql
+            params = (start_time, end_time, after[0], after[1], limit)
+
+        async with self.read_pool.connection() as conn:
             async with conn.cursor(row_factory=dict_row) as cur:
-                await cur.execute(
-                    sql,
-                    (start_time, end_time)
-                )
-                return await cur.fetchall()
+                await cur.execute(sql, params)
+                rows = await cur.fetchall()
 
+        next_cursor = None
+        if len(rows) == limit:
+            last = rows[-1]
+            next_cursor = (last["created_at"], last["id"])
 
-    async def get_events_by_range(
+        return {"rows": rows, "next": next_cursor}
+
+
+    async def stream_events_by_month(
         self,
-        start_time: str,
-        end_time: str
-    ):
+        year: int,
+        month: int
+    ) -> AsyncIterator[bytes]:
         """
-        返回指定时间区间内，
+        以 NDJSON 流的形式返回某年某月，
         所有 origin 的事件明细
+        
+        查询在返回前已执行并取到第一批数据，参数或查询错误在此处抛出
         """
-        sql = """
-        SELECT *
-        FROM external_link_snapshot
-        WHERE created_at >= %s
-        AND created_at <= %s
-        ORDER BY origin_url ASC, created_at ASC;
+        start_time, end_time = self._month_bounds(year, month)
+        return await self._open_ndjson_stream(
+            EVENTS_BY_MONTH_SQL,
+            (start_time, end_time)
+        )
+
+    async def stream_events_by_range(
+        self,
+        start_time: datetime,
+        end_time: datetime
+    ) -> AsyncIterator[bytes]:
         """
+        以 NDJSON 流的形式返回指定时间区间内，
+        所有 origin 的事件明细
+        
+        查询在返回前已执行并取到第一批数据，参数或查询错误在此处抛出
+        """
+        return await self._open_ndjson_stream(
+            EVENTS_BY_RANGE_SQL,
+            (start_time, end_time)
+        )
 
-        async with self.pool.connection() as conn:
-            async with conn.cursor(row_factory=dict_row) as cur:
-                await cur.execute(
-                    sql,
-                    (start_time, end_time)
-                )
-                return await cur.fetchall()
+    async def _open_ndjson_stream(self, sql: str, params: tuple) -> AsyncIterator[bytes]:
+        """
+        使用服务端游标执行查询，返回逐行输出 NDJSON 的异步迭代器
+
+        内存占用与结果集大小无关，客户端可以在查询完成前开始接收数据。
+        连接来自独立的 stream_pool，在迭代结束（或客户端断开）时归还；
+        stream_pool 已满时等待 DB_STREAM_POOL_TIMEOUT 秒后抛出 PoolTimeout。
+        
+        截断: 游标在事务内逐批读取，客户端停止读取期间连接处于
+        "idle in transaction"。超过 DB_STREAM_IDLE_IN_TRANSACTION_TIMEOUT
+        后服务端终止会话，此时响应头（200）已发出，响应体在某一行末尾结束，
+        错误仅记录在服务端日志中。
+        """
+        stack = AsyncExitStack()
+        try:
+            conn = await stack.enter_async_context(self.stream_pool.connection())
+            cur = await stack.enter_async_context(
+                conn.cursor(name="stream_events", row_factory=dict_row)
+            )
+            cur.itersize = STREAM_ITERSIZE
+            await cur.execute(sql, params)
+            first_rows = await cur.fetchmany(STREAM_ITERSIZE)
+        except BaseException:
+            await stack.__aexit__(*sys.exc_info())
+            raise
+
+        return self._iter_ndjson(stack, cur, first_rows)
+
+    @staticmethod
+    async def _iter_ndjson(stack: AsyncExitStack, cur, first_rows: list) -> AsyncIterator[bytes]:
+        """逐行序列化游标结果，结束时关闭游标并归还连接"""
+        async with stack:
+            for row in first_rows:
+                yield orjson.dumps(row) + b"\n"
+            try:
+                async for row in cur:
+                    yield orjson.dumps(row) + b"\n"
+            except Exception as e:
+                logger.error("流式导出中断，响应已截断: %s", e, exc_info=True)
+                raise
+
+    @staticmethod
+    def _month_bounds(year: int, month: int) -> Tuple[datetime, datetime]:
+        """返回某年某月的 [起始时间, 下月起始时间)"""
+        start_time = datetime(year, month, 1)
+        if month == 12:
+            end_time = datetime(year + 1, 1, 1)
+        else:
+            end_time = datetime(year, month + 1, 1)
+        return start_time, end_time
 
 
 # 全局数据库实例
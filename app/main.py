@@ -6,6 +6,7 @@ import logging
 import sys
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.database import db
@@ -17,7 +18,9 @@ from app.models import (
     ErrorResponse,
     GetDayRequest,
     GetMonthRequest,
-    GetRangeRequest
+    GetRangeRequest,
+    StreamMonthRequest,
+    StreamRangeRequest
 )
 
 # 配置日志
@@ -31,6 +34,9 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# 日志分隔线，只构造一次
+_BANNER = "=" * 60
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -47,22 +53,26 @@ async def lifespan(app: FastAPI):
     
     # 关闭
     logger.info("应用关闭中...")
+    await playwright_service.aclose()
     await db.disconnect()
     logger.info("应用已关闭")
 
 
 # 创建 FastAPI 应用
+# 默认使用 orjson 序列化；查询接口直接返回 ORJSONResponse，跳过 jsonable_encoder 的逐行转换
 app = FastAPI(
     root_path="/api/external-link-monitor",
     title="外链点击篡改监控系统",
     description="External Link Click Monitoring & Security Audit System",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# 允许的来源由配置决定；服务间调用不带 Origin 头，CORSMiddleware 会直接放行
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=settings.CORS_ALLOW_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -87,9 +97,16 @@ async def health_check():
     }
 
 
+@app.get("/debug/pool", tags=["健康检查"])
+async def debug_pool():
+    """连接池运行指标（requests_waiting, pool_available 等）"""
+    return db.get_pool_stats()
+
+
 @app.post(
     "/api/external-link-snapshot",
     tags=["快照管理"],
+    response_model=CreateSnapshotResponse,
     summary="创建外链点击快照",
     description="执行网页点击操作并记录安全快照"
 )
@@ -99,42 +116,41 @@ async def create_snapshot(request: CreateSnapshotRequest):
     
     执行流程:
     1. 调用 Playwright Service 执行点击操作
-    2. 接收截图和页面信息
-    3. 保存截图文件
+    2. 接收页面信息，截图字节流直接保存为文件
+    3. 确认截图已落盘
     4. 写入数据库
     5. 返回快照 ID
     """
-    logger.info("=" * 60)
-    logger.info(f"收到创建快照请求: origin_url={request.origin_url}")
-    logger.info(f"点击参数: type={request.click_type}, value={request.click_value}")
-    logger.info("=" * 60)
+    logger.info(_BANNER)
+    logger.info("收到创建快照请求: origin_url=%s", request.origin_url)
+    logger.info("点击参数: type=%s, value=%s", request.click_type, request.click_value)
+    logger.info(_BANNER)
     
     try:
-        # 1. 调用 Playwright Service
+        # 1. 调用 Playwright Service，截图字节流直接写入文件
         logger.info("步骤 1/4: 调用 Playwright Service...")
-        playwright_result = await playwright_service.render_click(
+        screenshot_path = screenshot_manager.new_filepath()
+        playwright_result = await playwright_service.render_click_stream(
             url=request.origin_url,
             click_type=request.click_type,
             click_value=request.click_value,
+            filepath=screenshot_path,
             wait_after_click_ms=request.wait_after_click_ms,
             full_page=request.full_page
         )
         
         page_url = playwright_result.get('page_url')
         page_hash = playwright_result.get('page_hash')
-        screenshot_base64 = playwright_result.get('screenshot_base64')
         
-        logger.info(f"Playwright 执行完成: page_url={page_url}")
-        logger.info(f"page_hash={page_hash[:16] if page_hash else 'None'}...")
+        logger.info("Playwright 执行完成: page_url=%s", page_url)
+        logger.info("page_hash=%.16s...", page_hash)
         
-        # 2. 保存截图文件
-        logger.info("步骤 2/4: 保存截图文件...")
-        screenshot_path = screenshot_manager.save_screenshot(screenshot_base64)
-        logger.info(f"截图已保存: {screenshot_path}")
+        # 2. 截图已在流式接收时落盘
+        logger.info("步骤 2/4: 截图已保存: %s", screenshot_path)
         
         # 3. 写入数据库
         logger.info("步骤 3/4: 写入数据库...")
-        res = await db.insert_snapshot(
+        snapshot_id = await db.insert_snapshot(
             origin_url=request.origin_url,
             click_type=request.click_type,
             click_value=request.click_value,
@@ -145,16 +161,16 @@ async def create_snapshot(request: CreateSnapshotRequest):
         
         # 4. 返回结果
         logger.info("步骤 4/4: 返回结果")
-        logger.info("=" * 60)
-        logger.info(f"✓ 快照创建成功")
-        logger.info("=" * 60)
+        logger.info(_BANNER)
+        logger.info("✓ 快照创建成功: snapshot_id=%s", snapshot_id)
+        logger.info(_BANNER)
         
-        return res
+        return CreateSnapshotResponse(snapshot_id=snapshot_id)
         
     except Exception as e:
-        logger.error("=" * 60)
-        logger.error(f"✗ 快照创建失败: {e}")
-        logger.error("=" * 60)
+        logger.error(_BANNER)
+        logger.error("✗ 快照创建失败: %s", e)
+        logger.error(_BANNER)
         logger.error("详细错误信息:", exc_info=True)
         
         raise HTTPException(
@@ -170,10 +186,10 @@ async def get_daily_stats_last_60_days():
     """
     try:
         res = await db.get_daily_stats_last_60_days()       
-        return res
+        return ORJSONResponse(res)
     
     except Exception as e:
-        logger.error(f"查询失败: {e}", exc_info=True)       
+        logger.error("查询失败: %s", e, exc_info=True)       
         raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
 
 @app.post("/get-yesterday-events")
@@ -183,10 +199,10 @@ async def get_yesterday_events():
     """
     try:
         res = await db.get_yesterday_events()       
-        return res
+        return ORJSONResponse(res)
     
     except Exception as e:
-        logger.error(f"查询失败: {e}", exc_info=True)       
+        logger.error("查询失败: %s", e, exc_info=True)       
         raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
 
 @app.post("/get-events-by-day")
@@ -197,36 +213,82 @@ async def get_events_by_day(request: GetDayRequest):
     """
     try:
         res = await db.get_events_by_day(request.day)       
-        return res
+        return ORJSONResponse(res)
     
     except Exception as e:
-        logger.error(f"查询失败: {e}", exc_info=True)       
+        logger.error("查询失败: %s", e, exc_info=True)       
         raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
     
 @app.post("/get-events-by-month")
 async def get_events_by_month(request: GetMonthRequest):
     """
-    返回某年某月，
+    分页返回某年某月，
     所有 origin 的事件明细
+    
+    返回 {"rows": [...], "next": [created_at, id] | null}，
+    将 next 作为下一次请求的 after 即可获取下一页
     """
     try:
-        res = await db.get_events_by_month(request.year, request.month)       
-        return res
+        res = await db.get_events_by_month(
+            request.year,
+            request.month,
+            limit=request.limit,
+            after=request.after
+        )
+        return ORJSONResponse(res)
     
     except Exception as e:
-        logger.error(f"查询失败: {e}", exc_info=True)       
+        logger.error("查询失败: %s", e, exc_info=True)       
         raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
     
 @app.post("/get-events-by-range")
 async def get_events_by_range(request: GetRangeRequest):
     """
-    返回指定时间区间内，
+    分页返回指定时间区间内，
+    所有 origin 的事件明细
+    
+    返回 {"rows": [...], "next": [created_at, id] | null}，
+    将 next 作为下一次请求的 after 即可获取下一页
+    """
+    try:
+        res = await db.get_events_by_range(
+            request.start_time,
+            request.end_time,
+            limit=request.limit,
+            after=request.after
+        )
+        return ORJSONResponse(res)
+    
+    except Exception as e:
+        logger.error("查询失败: %s", e, exc_info=True)       
+        raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
+
+@app.post("/stream-events-by-month")
+async def stream_events_by_month(request: StreamMonthRequest):
+    """
+    以 NDJSON（每行一条记录）流式返回某年某月，
     所有 origin 的事件明细
     """
     try:
-        res = await db.get_events_by_range(request.start_time, request.end_time)       
-        return res
+        stream = await db.stream_events_by_month(request.year, request.month)
     
     except Exception as e:
-        logger.error(f"查询失败: {e}", exc_info=True)       
-        raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
\ No newline at end of file
+        logger.error("查询失败: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
+    
+    return StreamingResponse(stream, media_type="application/x-ndjson")
+
+@app.post("/stream-events-by-range")
+async def stream_events_by_range(request: StreamRangeRequest):
+    """
+    以 NDJSON（每行一条记录）流式返回指定时间区间内，
+    所有 origin 的事件明细
+    """
+    try:
+        stream = await db.stream_events_by_range(request.start_time, request.end_time)
+    
+    except Exception as e:
+        logger.error("查询失败: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
+    
+    return StreamingResponse(stream, media_type="application/x-ndjson")
@@ -2,8 +2,8 @@
 Pydantic 数据模型定义
 用于请求验证和响应序列化
 """
-from pydantic import BaseModel, Field, HttpUrl
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, Tuple
 from datetime import datetime
 
 
@@ -15,8 +15,9 @@ class CreateSnapshotRequest(BaseModel):
     wait_after_click_ms: int = Field(default=3000, ge=0, description="点击后等待时间（毫秒）")
     full_page: bool = Field(default=True, description="是否全页面截图")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "origin_url": "https://example.com",
                 "click_type": "text",
@@ -25,6 +26,7 @@ class CreateSnapshotRequest(BaseModel):
                 "full_page": True
             }
         }
+    )
 
 
 class CreateSnapshotResponse(BaseModel):
@@ -32,13 +34,15 @@ class CreateSnapshotResponse(BaseModel):
     snapshot_id: int = Field(..., description="快照记录 ID")
     status: str = Field(default="ok", description="执行状态")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "snapshot_id": 123,
                 "status": "ok"
             }
         }
+    )
 
 
 class SnapshotDetail(BaseModel):
@@ -52,8 +56,9 @@ class SnapshotDetail(BaseModel):
     screenshot_path: str = Field(..., description="截图文件路径")
     created_at: datetime = Field(..., description="创建时间")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "id": 123,
                 "origin_url": "https://example.com",
@@ -65,6 +70,7 @@ class SnapshotDetail(BaseModel):
                 "created_at": "2024-01-15T12:34:56"
             }
         }
+    )
 
 
 class ErrorResponse(BaseModel):
@@ -72,47 +78,91 @@ class ErrorResponse(BaseModel):
     status: str = Field(default="error", description="状态")
     message: str = Field(..., description="错误信息")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "status": "error",
                 "message": "快照不存在"
             }
         }
+    )
 
 class GetDayRequest(BaseModel):
     """指定日期（YYYY-MM-DD）"""
     day: str = Field(..., description="创建时间")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "day": "2026-01-13",
             }
         }
+    )
 
 class GetMonthRequest(BaseModel):
     """指定year, month"""
     year: int = Field(..., description="创建年份")
     month: int = Field(..., description="创建月份")
+    limit: int = Field(default=1000, ge=1, le=10000, description="每页最大条数")
+    after: Optional[Tuple[datetime, int]] = Field(None, description="分页游标: 上一页返回的 next，为空时取第一页")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "year": 2026,
                 "month":1,
+                "limit": 1000,
             }
         }
+    )
 
 class GetRangeRequest(BaseModel):
     """指定year, month"""
     start_time: str = Field(..., description="创建开始时间")
     end_time: str = Field(..., description="创建结束时间")
+    limit: int = Field(default=1000, ge=1, le=10000, description="每页最大条数")
+    after: Optional[Tuple[datetime, int]] = Field(None, description="分页游标: 上一页返回的 next，为空时取第一页")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "start_time": "2026-01-01T00:00:00",
                 "end_time": "2026-01-31T23:59:59",
+                "limit": 1000,
             }
-        }
\ No newline at end of file
+        }
+    )
+
+class StreamMonthRequest(BaseModel):
+    """流式导出: 指定year, month（不分页）"""
+    year: int = Field(..., description="创建年份")
+    month: int = Field(..., description="创建月份")
+    
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
+            "example": {
+                "year": 2026,
+                "month":1,
+            }
+        }
+    )
+
+class StreamRangeRequest(BaseModel):
+    """流式导出: 指定时间区间（不分页）"""
+    start_time: datetime = Field(..., description="创建开始时间")
+    end_time: datetime = Field(..., description="创建结束时间")
+    
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
+            "example": {
+                "start_time": "2026-01-01T00:00:00",
+                "end_time": "2026-01-31T23:59:59",
+            }
+        }
+    )
\ No newline at end of file
@@ -3,11 +3,12 @@
 负责调用 Playwright Service 和处理业务逻辑
 """
 import logging
+import asyncio
 import base64
 import os
-import uuid
+import time
+import aiofiles
 import httpx
-from datetime import datetime
 from typing import Dict, Any, Optional
 from app.config import settings
 
@@ -21,28 +22,54 @@ class PlaywrightService:
         """初始化 Playwright 服务配置"""
         self.base_url = settings.PLAYWRIGHT_SERVICE_URL
         self.timeout = 120.0  # 2分钟超时
-        logger.info(f"Playwright Service URL: {self.base_url}")
+        
+        # 复用同一个客户端，保持 keep-alive 连接池，避免每次请求重新建连
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=100,
+                max_keepalive_connections=50,
+                keepalive_expiry=60
+            )
+        )
+        logger.info("Playwright Service URL: %s", self.base_url)
+    
+    async def aclose(self):
+        """关闭 HTTP 客户端连接池"""
+        await self._client.aclose()
+        logger.info("Playwright Service 客户端已关闭")
     
-    async def render_click(
+    async def render_click_stream(
         self,
         url: str,
         click_type: str,
         click_value: str,
+        filepath: str,
         wait_after_click_ms: int = 3000,
         full_page: bool = True
     ) -> Dict[str, Any]:
         """
-        调用 Playwright Service 执行点击渲染
+        调用 Playwright Service 执行点击渲染，并把截图写入 filepath
+        
+        优先请求原始 PNG 字节流（Accept: image/png）：截图按块直接落盘，
+        page_url / page_hash 通过 X-Page-Url / X-Page-Hash 响应头返回，
+        省去 base64 带来的 33% 传输体积、JSON 解析和一次完整解码。
+        
+        尚未升级的 Playwright Service 仍返回 JSON（screenshot_base64），
+        此时按旧协议解析，并在线程池中解码写盘。
+        其他 Content-Type 视为失败；缺少 page_hash 时记录警告，按 NULL 入库。
         
         Args:
             url: 目标页面 URL
             click_type: 点击类型 (text/css/xpath/aria)
             click_value: 点击值
+            filepath: 截图写入的目标路径
             wait_after_click_ms: 点击后等待时间（毫秒）
             full_page: 是否全页面截图
             
         Returns:
-            包含 page_url, page_hash, screenshot_base64 的字典
+            包含 page_url, page_hash, screenshot_size 的字典
             
         Raises:
             httpx.HTTPError: HTTP 请求失败
@@ -58,47 +85,109 @@ class PlaywrightService:
             "full_page": full_page
         }
         
-        logger.info(f"调用 Playwright Service: {self.base_url}/render-click")
-        logger.debug(f"请求参数: url={url}, click_type={click_type}, click_value={click_value}")
+        logger.info("调用 Playwright Service: %s/render-click", self.base_url)
+        logger.debug("请求参数: url=%s, click_type=%s, click_value=%s", url, click_type, click_value)
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/render-click",
-                    json=request_data
-                )
+            async with self._client.stream(
+                "POST",
+                "/render-click",
+                json=request_data,
+                headers={"Accept": "image/png, application/json;q=0.5"}
+            ) as response:
                 
                 # 检查响应状态
                 if response.status_code != 200:
                     error_msg = f"Playwright Service 返回错误: {response.status_code}"
+                    await response.aread()
                     logger.error(error_msg)
-                    logger.error(f"响应内容: {response.text}")
+                    logger.error("响应内容: %s", response.text)
                     raise Exception(error_msg)
                 
-                result = response.json()
+                content_type = response.headers.get("content-type", "")
                 
-                # 验证返回数据
-                if result.get('status') != 'ok':
-                    error_msg = f"Playwright Service 执行失败: {result.get('message', 'Unknown error')}"
-                    logger.error(error_msg)
-                    raise Exception(error_msg)
+                if content_type.startswith("image/png"):
+                    # page_hash 由 Playwright Service 计算，这里只读取响应头
+                    page_url = response.headers.get("x-page-url")
+                    page_hash = response.headers.get("x-page-hash")
+                    if not page_hash:
+                        logger.warning("Playwright Service 响应缺少 X-Page-Hash 头，page_hash 记为 NULL: url=%s", url)
+                    
+                    # 截图字节流直接落盘
+                    size = 0
+                    async with aiofiles.open(filepath, 'wb') as f:
+                        async for chunk in response.aiter_bytes(65536):
+                            await f.write(chunk)
+                            size += len(chunk)
                 
-                logger.info(f"Playwright Service 执行成功")
-                logger.debug(f"page_url={result.get('page_url')}, page_hash={result.get('page_hash', '')[:16]}...")
-                
-                return result
+                elif content_type.startswith("application/json"):
+                    # 旧协议: JSON + screenshot_base64
+                    await response.aread()
+                    result = response.json()
+                    
+                    if result.get('status') != 'ok':
+                        raise Exception(
+                            f"Playwright Service 执行失败: {result.get('message', 'Unknown error')}"
+                        )
+                    
+                    page_url = result.get('page_url')
+                    page_hash = result.get('page_hash')
+                    screenshot_base64 = result.get('screenshot_base64')
+                    if not page_hash:
+                        logger.warning("Playwright Service 响应缺少 page_hash，page_hash 记为 NULL: url=%s", url)
+                    if not screenshot_base64:
+                        raise Exception("Playwright Service 响应缺少 screenshot_base64")
+                    
+                    # base64 解码和写盘是阻塞操作，放到线程池中执行
+                    size = await asyncio.to_thread(
+                        self._write_base64_screenshot, filepath, screenshot_base64
+                    )
                 
+                else:
+                    raise Exception(
+                        f"Playwright Service 返回了不支持的 Content-Type: {content_type or 'None'}"
+                    )
+            
+            logger.info("Playwright Service 执行成功")
+            logger.info("截图保存成功: %s (%d bytes)", filepath, size)
+            logger.debug("page_url=%s, page_hash=%.16s...", page_url, page_hash or '')
+            
+            return {
+                "page_url": page_url,
+                "page_hash": page_hash,
+                "screenshot_size": size
+            }
+            
         except httpx.TimeoutException as e:
             error_msg = f"Playwright Service 请求超时: {e}"
             logger.error(error_msg, exc_info=True)
+            self._discard_partial(filepath)
             raise Exception(error_msg)
         except httpx.HTTPError as e:
             error_msg = f"Playwright Service HTTP 请求失败: {e}"
             logger.error(error_msg, exc_info=True)
+            self._discard_partial(filepath)
             raise Exception(error_msg)
         except Exception as e:
-            logger.error(f"调用 Playwright Service 失败: {e}", exc_info=True)
+            logger.error("调用 Playwright Service 失败: %s", e, exc_info=True)
+            self._discard_partial(filepath)
             raise
+    
+    @staticmethod
+    def _write_base64_screenshot(filepath: str, screenshot_base64: str) -> int:
+        """解码 base64 截图并写入文件（在工作线程中运行），返回写入字节数"""
+        screenshot_data = base64.b64decode(screenshot_base64)
+        with open(filepath, 'wb') as f:
+            f.write(screenshot_data)
+        return len(screenshot_data)
+    
+    @staticmethod
+    def _discard_partial(filepath: str):
+        """删除写入失败残留的截图文件"""
+        try:
+            os.remove(filepath)
+        except FileNotFoundError:
+            pass
 
 
 class ScreenshotManager:
@@ -108,47 +197,38 @@ class ScreenshotManager:
         """初始化截图目录"""
         self.screenshot_dir = settings.SCREENSHOT_DIR
         
-        # 确保截图目录存在
+        # 文件名时间戳缓存: (秒级 epoch, 格式化字符串)，同一秒内不重复格式化
+        self._ts_cache = (0, "")
+        
+        # 确保截图目录及 256 个分片子目录存在，请求路径上不再需要 mkdir
         os.makedirs(self.screenshot_dir, exist_ok=True)
-        logger.info(f"截图目录: {self.screenshot_dir}")
+        for i in range(256):
+            os.makedirs(os.path.join(self.screenshot_dir, f"{i:02x}"), exist_ok=True)
+        logger.info("截图目录: %s", self.screenshot_dir)
     
-    def save_screenshot(self, screenshot_base64: str) -> str:
+    def new_filepath(self) -> str:
         """
-        保存截图文件
+        生成一个新的截图文件路径
         
-        Args:
-            screenshot_base64: Base64 编码的截图数据
-            
         Returns:
-            截图文件的相对路径
-            
-        Raises:
-            Exception: 保存失败
+            截图文件的完整路径
         """
-        try:
-            # 生成唯一文件名: timestamp_uuid.png
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            unique_id = str(uuid.uuid4())[:8]
-            filename = f"{timestamp}_{unique_id}.png"
-            
-            # 完整路径
-            filepath = os.path.join(self.screenshot_dir, filename)
-            
-            logger.info(f"保存截图: {filename}")
-            
-            # 解码 base64 并保存
-            screenshot_data = base64.b64decode(screenshot_base64)
-            
-            with open(filepath, 'wb') as f:
-                f.write(screenshot_data)
-            
-            logger.info(f"截图保存成功: {filepath} ({len(screenshot_data)} bytes)")
-            
-            return filepath
-            
-        except Exception as e:
-            logger.error(f"保存截图失败: {e}", exc_info=True)
-            raise
+        # 生成唯一文件名: timestamp_random.png
+        # 随机部分直接取 os.urandom 的 hex，无需构造完整 UUID
+        timestamp = self._timestamp()
+        unique_id = os.urandom(4).hex()
+        filename = f"{timestamp}_{unique_id}.png"
+        
+        # 按随机部分前两位分到 256 个子目录，避免单目录文件过多
+        # （子目录已在初始化时创建）
+        return os.path.join(self.screenshot_dir, unique_id[:2], filename)
+    
+    def _timestamp(self) -> str:
+        """返回当前时间的 %Y%m%d_%H%M%S 字符串，每秒只格式化一次"""
+        now = int(time.time())
+        if now != self._ts_cache[0]:
+            self._ts_cache = (now, time.strftime("%Y%m%d_%H%M%S", time.localtime(now)))
+        return self._ts_cache[1]
     
     def screenshot_exists(self, filepath: str) -> bool:
         """
@@ -163,7 +243,7 @@ class ScreenshotManager:
         exists = os.path.isfile(filepath)
         
         if not exists:
-            logger.warning(f"截图文件不存在: {filepath}")
+            logger.warning("截图文件不存在: %s", filepath)
         
         return exists
 